@@ -1,9 +1,7 @@
 import os
-import base64
-from datetime import timedelta
 
 import streamlit as st
-import matplotlib.pyplot as plt
+import numpy as np
 import pandas as pd
 
 # Firebase Admin SDK
@@ -18,89 +16,135 @@ st.set_page_config(page_title="Raspberry Pi Server", layout="wide")
 # -----------------------------------------------------------------------------
 # Firebase initialization (exactly once; safe for Streamlit reruns)
 # -----------------------------------------------------------------------------
-def init_firebase():
-    if not firebase_admin._apps:
-        try:
-            service_account = dict(st.secrets["firebase"])
-        except Exception:
-            st.error(
-                "Firebase credentials not found. "
-                "Add your service account JSON under `[firebase]` in Settings → Secrets."
-            )
-            st.stop()
-
-        try:
-            cred = credentials.Certificate(service_account)
-            firebase_admin.initialize_app(cred)
-        except Exception as e:
-            st.error(
-                "Failed to initialize Firebase. "
-                "Please verify your service account fields in Secrets."
-            )
-            # Show a short, non-sensitive hint
-            st.caption("Tip: Ensure `private_key` retains its BEGIN/END lines and newlines.")
-            st.stop()
-
-init_firebase()
-db = firestore.client()
+@st.cache_resource
+def _firebase_app():
+    """Initializes the Firebase app once per process; reruns get the cached app."""
+    if firebase_admin._apps:
+        return firebase_admin.get_app()
+
+    try:
+        service_account = dict(st.secrets["firebase"])
+    except Exception:
+        st.error(
+            "Firebase credentials not found. "
+            "Add your service account JSON under `[firebase]` in Settings → Secrets."
+        )
+        st.stop()
+
+    try:
+        cred = credentials.Certificate(service_account)
+        return firebase_admin.initialize_app(cred)
+    except Exception:
+        st.error(
+            "Failed to initialize Firebase. "
+            "Please verify your service account fields in Secrets."
+        )
+        # Show a short, non-sensitive hint
+        st.caption("Tip: Ensure `private_key` retains its BEGIN/END lines and newlines.")
+        st.stop()
+
+@st.cache_resource
+def get_db():
+    """Returns a Firestore client shared across reruns and sessions."""
+    return firestore.client(app=_firebase_app())
+
+_firebase_app()
 
 # -----------------------------------------------------------------------------
 # Data access
 # -----------------------------------------------------------------------------
-@st.cache_data(ttl=60)
-def fetch_firestore_data(collection_name: str) -> pd.DataFrame:
+FETCH_LIMIT = 500  # max docs read per fetch
+
+def _query_latest(collection_name: str, since=None) -> list:
     """
-    Pulls a small recent window of docs from Firestore based on the latest timestamp,
-    then returns a tidy DataFrame with timestamp + voltage columns.
+    Returns up to FETCH_LIMIT of the newest docs (oldest first). When `since` is a
+    timestamp, only docs at or after it are read (cursor pagination).
     """
-    # Find latest doc to establish the time window
-    latest = list(
-        db.collection(collection_name)
+    # Newest-first with a hard limit keeps reads bounded regardless of write rate
+    query = (
+        get_db().collection(collection_name)
+          .select(["timestamp", "voltage"])  # only the fields we plot
           .order_by("timestamp", direction=firestore.Query.DESCENDING)
-          .limit(1)
-          .stream()
-    )
-    if not latest:
-        return pd.DataFrame()
-
-    latest_ts = latest[0].to_dict().get("timestamp")
-    if latest_ts is None:
-        return pd.DataFrame()
-
-    # Look back a few seconds around the latest to capture a burst of points
-    start_ts = latest_ts - timedelta(seconds=5)
-
-    docs = (
-        db.collection(collection_name)
-          .where("timestamp", ">=", start_ts)
-          .order_by("timestamp", direction=firestore.Query.ASCENDING)
-          .stream()
     )
-
-    rows = []
+    if since is not None:
+        query = query.end_at({"timestamp": since})
+
+    docs = list(query.limit(FETCH_LIMIT).stream())
+    docs.reverse()
+    return docs
+
+def _docs_to_frame(docs: list) -> pd.DataFrame:
+    # Docs are already materialized, so size the columns once and fill by index
+    n = len(docs)
+    id_arr = np.empty(n, dtype=object)
+    ts_arr = np.empty(n, dtype=object)
+    v_arr = np.empty(n, dtype=np.float32)
+    i = 0
     for d in docs:
         doc = d.to_dict()
         ts = doc.get("timestamp")
         v = doc.get("voltage")
         if ts is not None and v is not None:
-            rows.append({"timestamp": ts, "voltage": v})
+            id_arr[i] = d.id
+            ts_arr[i] = ts
+            v_arr[i] = v
+            i += 1
 
-    return pd.DataFrame(rows)
+    # Parse timestamps once at fetch time rather than on every rerun
+    ts = pd.to_datetime(pd.Index(ts_arr[:i]), utc=True, cache=True)
+    return pd.DataFrame({"id": id_arr[:i], "timestamp": ts, "voltage": v_arr[:i]})
+
+@st.cache_data(ttl=60, max_entries=8)
+def fetch_firestore_data(collection_name: str) -> pd.DataFrame:
+    """
+    Pulls the most recent FETCH_LIMIT docs from Firestore in a single query,
+    then returns a tidy DataFrame with id + timestamp + voltage columns (oldest first).
+    """
+    return _docs_to_frame(_query_latest(collection_name))
+
+def fetch_live_readings(collection_name: str) -> pd.DataFrame:
+    """
+    Keeps a rolling FETCH_LIMIT-point window per session. The first call is seeded
+    from fetch_firestore_data; later calls only read docs from the last timestamp
+    already held in st.session_state onwards.
+    """
+    key = f"readings:{collection_name}"
+    df = st.session_state.get(key)
+
+    if df is None:
+        df = fetch_firestore_data(collection_name)
+    elif df.empty:
+        # Nothing seen yet: query live so new data shows up on the next tick
+        df = _docs_to_frame(_query_latest(collection_name))
+    else:
+        # Burst writes can share a timestamp and ties come back in doc-ID order,
+        # so the cursor is inclusive and already-held docs are dropped by ID
+        cursor = df["timestamp"].iloc[-1]
+        new = _docs_to_frame(_query_latest(collection_name, since=cursor.to_pydatetime()))
+        new = new[~new["id"].isin(df["id"])]
+        if not new.empty:
+            df = pd.concat([df, new], ignore_index=True).tail(FETCH_LIMIT).reset_index(drop=True)
+
+    st.session_state[key] = df
+    return df
 
 # -----------------------------------------------------------------------------
 # Helpers
 # -----------------------------------------------------------------------------
-def apply_background_image_if_exists(path: str = "background.jpg") -> None:
-    if not os.path.exists(path):
+def apply_background_image_if_exists(filename: str = "background.jpg") -> None:
+    """
+    Points the app background at an image in ./static, which Streamlit serves at
+    app/static/ (server.enableStaticServing) so the browser can cache it instead
+    of receiving it inline on every rerun.
+    """
+    if not os.path.exists(os.path.join("static", filename)):
         return
     try:
-        with open(path, "rb") as f:
-            img_b64 = base64.b64encode(f.read()).decode()
         st.markdown(
             f"""
             <style>
             .stApp {{
-                background-image: url("data:image/jpg;base64,{img_b64}");
+                background-image: url("./app/static/{filename}");
                 background-size: cover;
             }}
             </style>
@@ -121,30 +165,20 @@ with st.sidebar:
 
 COLLECTION = "voltage"  # 🔁 use the same collection name everywhere
 
-if side_page == "Home":
-    st.subheader("Live Graph from Database")
-
-    df = fetch_firestore_data(COLLECTION)
+@st.fragment(run_every="5s")
+def live_graph() -> None:
+    # Reruns on its own timer without re-executing the sidebar, background, etc.
+    df = fetch_live_readings(COLLECTION)
 
     if not df.empty:
-        # Ensure pandas datetime for plotting
-        df["timestamp"] = pd.to_datetime(df["timestamp"])
-
-        fig, ax = plt.subplots()
-        ax.plot(df["timestamp"], df["voltage"], marker=".", label="VOLTAGE (V)")
-        ax.set_xlabel("Time")
-        ax.set_ylabel("Voltage")
-        ax.legend()
-        ax.grid(True)
-        plt.xticks(rotation=45)
-        st.pyplot(fig)
+        # Rendered client-side as an interactive vector chart (no PNG per rerun)
+        st.line_chart(df, x="timestamp", y="voltage")
     else:
         st.warning(f"No data found in the '{COLLECTION}' collection yet.")
 
-    # Refresh button
-    if st.button("🔄 Refresh", type="primary"):
-        st.cache_data.clear()
-        st.rerun()
+if side_page == "Home":
+    st.subheader("Live Graph from Database")
+    live_graph()
 
     # Device info cards
     st.subheader("Device Information")
@@ -153,21 +187,9 @@ if side_page == "Home":
 
     curr_power_v = 69
     power_generated_wh = 420
-    st.markdown(
-        f"""
-        <div style="display:flex; gap:12px; flex-wrap:wrap;">
-          <div style="flex:1; min-width:220px; padding:12px; border-radius:10px; background:#f9f9f9;">
-            <h4>⚡ Current Power</h4>
-            <p style="font-size:20px;"><b>{curr_power_v} V</b></p>
-          </div>
-          <div style="flex:1; min-width:220px; padding:12px; border-radius:10px; background:#f9f9f9;">
-            <h4>🔋 Power Generated</h4>
-            <p style="font-size:20px;"><b>{power_generated_wh} Wh</b></p>
-          </div>
-        </div>
-        """,
-        unsafe_allow_html=True,
-    )
+    c1, c2 = st.columns(2)
+    c1.metric("⚡ Current Power", f"{curr_power_v} V")
+    c2.metric("🔋 Power Generated", f"{power_generated_wh} Wh")
 
 elif side_page == "Upload":
     st.title("📂 Upload Files")